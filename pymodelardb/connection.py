@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+
 from pymodelardb.types import Interface
 from pymodelardb.types import NotSupportedError
 from pymodelardb.types import ProgrammingError
@@ -52,16 +54,12 @@ class Connection(object):
             raise NotSupportedError(
                   "only dsn, host, interface, and port is supported")
         elif dsn:   # The connection string is given precedence
-            try:
-                interface, hostAndMaybePort = dsn.split('://')
-                hostAndMaybePortSplit = hostAndMaybePort.split(':')
-                host = hostAndMaybePortSplit[0]
-                port = int(hostAndMaybePortSplit[1]) \
-                    if 1 < len(hostAndMaybePortSplit) \
-                    else DEFAULT_PORT_NUMBER
-            except ValueError:
+            interface, separator, hostAndMaybePort = dsn.partition('://')
+            host, portSeparator, port = hostAndMaybePort.partition(':')
+            if not separator or (portSeparator and not port.isdecimal()):
                 raise ProgrammingError(
-                    "dsn must be interface://hostname-or-ip[:port]") from None
+                    "dsn must be interface://hostname-or-ip[:port]")
+            port = int(port) if portSeparator else DEFAULT_PORT_NUMBER
         elif host and interface:
             pass
         else:
@@ -77,18 +75,9 @@ class Connection(object):
         self.__host = host
         self.__port = port
 
-        # Create a cursor that match the requested interface type. The cursors
-        # are imported from inside the method to break a circular import
+        # Create a cursor that match the requested interface type
         self.__closed = False
-        if interface is Interface.ARROW:
-            from pymodelardb.cursors import ArrowCursor
-            self.__cursor = ArrowCursor
-        elif interface is Interface.HTTP:
-            from pymodelardb.cursors import HTTPCursor
-            self.__cursor = HTTPCursor
-        elif interface is Interface.SOCKET:
-            from pymodelardb.cursors import SocketCursor
-            self.__cursor = SocketCursor
+        self.__cursor = _cursor_for(interface)
 
     def close(self):
         """Mark the connection as closed."""
@@ -108,3 +97,16 @@ class Connection(object):
         """Check if the connection have been closed."""
         if self.__closed:
             raise ProgrammingError(message)
+
+
+@functools.lru_cache(maxsize=None)
+def _cursor_for(interface: Interface):
+    """Return the Cursor class that implements interface."""
+    # The cursors are imported from inside the function to break a circular
+    # import, and the function is cached so it is only done once per interface
+    from pymodelardb import cursors
+    return {
+        Interface.ARROW: cursors.ArrowCursor,
+        Interface.HTTP: cursors.HTTPCursor,
+        Interface.SOCKET: cursors.SocketCursor
+    }[interface]
@@ -16,23 +16,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import itertools
-import locale
+import operator
 import re
+import socket
 
-import json
 from json.decoder import JSONDecodeError
 
-from telnetlib import Telnet
-from typing import Any, Union
-from urllib import request
-from urllib.error import URLError
+from http.client import HTTPConnection
+from http.client import HTTPException
+from typing import TYPE_CHECKING, Any, Union
 
 import pyarrow
 from pyarrow import flight
+from pyarrow.flight import FlightUnavailableError
 from pyarrow.lib import ArrowException
-from pyarrow._flight import FlightUnavailableError
-from pyarrow._flight import FlightStreamReader
+
+if TYPE_CHECKING:
+    from pyarrow.flight import FlightStreamReader
+
+# orjson is faster than json and both can parse bytes without decoding them
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 from pymodelardb.connection import Connection
 from pymodelardb.types import ProgrammingError
@@ -40,6 +48,45 @@ from pymodelardb.types import TypeOf
 
 __all__ = ['ArrowCursor', 'HTTPCursor', 'SocketCursor']
 
+# ModelarDB uses UTF-8 for queries and JSON so the locale is not looked up
+_ENCODING = 'utf-8'
+
+# Compiled once as the placeholders are extracted for each executed operation
+_PLACEHOLDER_RE = re.compile(r"%\((.*?)\)s")
+
+# The legacy JVM-based version of ModelarDB does not close the socket after a
+# response, so the end of the response is detected by the result set being
+# the last member of the JSON object and only whitespace being written after
+_END_OF_RESPONSE_RE = re.compile(rb"\]\s*\}\s*$")
+_END_OF_RESPONSE_MAX_LENGTH = 64
+_RECEIVE_BUFFER_SIZE = 65536
+
+# A ]} only ends the response if it is not in a string, which is the case if
+# the number of quotes is even when escaped characters are not counted
+_ESCAPED_CHARACTER_RE = re.compile(rb"\\.", re.DOTALL)
+
+# A ]} after an odd number of quotes is either in a string that continues in
+# the next segment or ends an error message containing a quote, so the next
+# segment is only waited for this many seconds before the response is ended
+_RECEIVE_TIMEOUT = 0.1
+
+# A result set with rows cannot end after an odd number of quotes, so such a
+# response is incomplete, while an error message is not a row and can do so
+_ROWS_RE = re.compile(rb'"result"\s*:\s*\[\s*\{')
+
+# The same content type as urllib.request.urlopen() is used for the queries
+_HTTP_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# Errors are extracted from the undecoded response if it is not valid JSON
+_ERROR_RE = re.compile(rb"\[(.*)\]", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=32)
+def _get_flight_client(uri: str):
+    """Return a client for uri that is shared by all cursors using it."""
+    # Clients are thread-safe so cursors can share the same gRPC channel
+    return flight.FlightClient(uri)
+
 
 class Cursor(object):
     """Represents a single connection to ModelarDB.
@@ -50,12 +97,11 @@ class Cursor(object):
     """
     def __init__(self, connection: Connection):
         self._connection = connection
-        self._encoding = locale.getpreferredencoding()
+        self._encoding = _ENCODING
         self._description = None
         self._rowcount = -1
         self.arraysize = 1
         self._result_set = None
-        self.__placeholder_search = re.compile("%\\((.*?)\\)s")
 
     @property
     def description(self):
@@ -75,10 +121,25 @@ class Cursor(object):
         self._is_closed("cannot close the cursor as it is already closed")
         self._connection = None
 
-    def executemany(self, operation: str, seq_of_parameters):
+    def execute(self, operation: Union[str, bytes, bytearray],
+                parameters: Any = None):
+        """Execute operation after adding the parameters."""
+        self._is_closed("cannot execute queries as the cursor is closed")
+        message = self._before_execute(operation.strip(), parameters)
+        self._execute_prepared(message)
+
+    def executemany(self, operation: Union[str, bytes, bytearray],
+                    seq_of_parameters):
         """Execute operation for each set of parameters."""
+        self._is_closed("cannot execute queries as the cursor is closed")
+
+        # The operation is only scanned for placeholders once
+        operation = operation.strip()
+        placeholders = None if isinstance(operation, (bytes, bytearray)) \
+            else _PLACEHOLDER_RE.findall(operation)
         for parameters in seq_of_parameters:
-            self.execute(operation, parameters)
+            message = self._before_execute(operation, parameters, placeholders)
+            self._execute_prepared(message)
 
     def fetchone(self):
         """Return the next row from the result set."""
@@ -111,44 +172,66 @@ class Cursor(object):
         """Unsupported method required by PEP 249."""
         self._is_closed("cannot set the output size as the cursor is closed")
 
-    def _before_execute(self, operation: str, parameters=None):
+    def _before_execute(self, operation: Union[str, bytes, bytearray],
+                        parameters=None,
+                        placeholders: Union[list, None] = None):
         """Ensure the cursor is ready and add the parameters to operation."""
+        # Operations that are already encoded are sent as is
+        if isinstance(operation, (bytes, bytearray)):
+            if parameters is not None:
+                raise ProgrammingError(
+                    "parameters cannot be added to an operation in bytes")
+            return bytes(operation)
+
         # Parameters are not escaped as both model-based TSMSs are read-only
-        if type(parameters) == dict:
+        if isinstance(parameters, dict):
             operation %= parameters
-        elif type(parameters) == list or type(parameters) == tuple:
-            placeholders = self.__placeholder_search.findall(operation)
+        elif isinstance(parameters, (list, tuple)):
+            if placeholders is None:
+                placeholders = _PLACEHOLDER_RE.findall(operation)
             operation %= dict(zip(placeholders, parameters))
         return operation.encode(self._encoding)
 
-    def _after_execute(self, response: bytes):
+    def _execute_prepared(self, message: bytes):
+        """Execute message which already contains the parameters."""
+        raise NotImplementedError
+
+    def _after_execute(self, response: Union[bytes, bytearray]):
         """Parse the response received from ModelarDB."""
-        result = response.decode(self._encoding)
         try:
-            result_set = json.loads(result)['result']
+            result_set = json_loads(response)['result']
         except JSONDecodeError:
             # Extract the exception thrown by the server's query engine
-            start_of_error = result.find('[') + 1
-            end_of_error = result.rfind(']')
+            error = _ERROR_RE.search(response)
+            error = error.group(1) if error else response
             message = 'unable to execute query due to:\n' \
-                + result[start_of_error:end_of_error].strip()
+                + error.decode(self._encoding, 'replace').strip()
             raise ProgrammingError(message) from None
 
         # The engine based on Apache Spark encodes an empty result as a {}
         if len(result_set) == 1 and not result_set[0]:
             result_set = []
-        self._result_set = map(lambda result:
-                               tuple(result.values()), result_set)
 
         # Only the name and type_code is mandatory, the rest can be None
+        names = []
         description = []
         if result_set:
             for name, value in result_set[0].items():
-                type_code = TypeOf.STRING if type(value) is str \
+                type_code = TypeOf.STRING if isinstance(value, str) \
                     else TypeOf.NUMBER
+                names.append(name)
                 description \
                     .append((name, type_code, None, None, None, None, False))
         self._description = tuple(description)
+
+        # itemgetter() creates the tuples in C and ensures the column order
+        if len(names) > 1:
+            self._result_set = map(operator.itemgetter(*names), result_set)
+        elif names:
+            self._result_set = zip(map(operator.itemgetter(names[0]),
+                                       result_set))
+        else:
+            self._result_set = iter(result_set)
         self._rowcount = len(result_set)
 
     def _is_closed(self, message: str):
@@ -166,7 +249,7 @@ class ArrowCursor(Cursor):
     def __init__(self, connection: Connection, host: str, port: int):
         Cursor.__init__(self, connection)
         self.__uri = 'grpc://' + host + ':' + str(port)
-        self.__client = flight.FlightClient(self.__uri)
+        self.__client = _get_flight_client(self.__uri)
         self.__type_map = {
             pyarrow.string(): TypeOf.STRING,
             pyarrow.int32(): TypeOf.NUMBER,
@@ -176,10 +259,8 @@ class ArrowCursor(Cursor):
             pyarrow.binary(): TypeOf.BINARY
         }
 
-    def execute(self, operation: str, parameters: Any = None):
-        """Execute operation after adding the parameters."""
-        self._is_closed("cannot execute queries as the cursor is closed")
-        message = self._before_execute(operation.strip(), parameters)
+    def _execute_prepared(self, message: bytes):
+        """Execute message which already contains the parameters."""
         query = flight.Ticket(message)
         try:
             response = self.__client.do_get(query)
@@ -195,7 +276,7 @@ class ArrowCursor(Cursor):
             message = 'unable to execute query due to: ' + error
             raise ProgrammingError(message) from None
 
-    def _after_execute(self, response: FlightStreamReader):
+    def _after_execute(self, response: 'FlightStreamReader'):
         """Convert the response received from ModelarDB."""
 
         # Only the name and type_code is mandatory, the rest can be None
@@ -206,20 +287,89 @@ class ArrowCursor(Cursor):
             description.append(
                 (name, type_code, None, None, None, None, False))
 
-        self._result_set = self.__wrap_with_generator(response)
+        self._result_set = response
         self._description = tuple(description)
         self._rowcount = -1  # The result set is returned in batches
+        self.__schema = schema
+        self.__chunks = iter(response)
+        self.__batch = None
+        self.__rows = []
+        self.__offset = 0
 
-    def __wrap_with_generator(self, fsr: FlightStreamReader):
-        """Wrap the stream of chunks with a generator that produce tuples."""
-        for chunk in fsr:
-            chunk = chunk.data
-            columns = chunk.to_pydict()
-            names = chunk.schema.names
-            result_set = [tuple(columns[column][row] for column in names)
-                          for row in range(chunk.num_rows)]
-            for row in result_set:
-                yield row
+    def fetchone(self):
+        """Return the next row from the result set."""
+        self._is_closed("cannot fetch a row as the cursor is closed")
+        self._is_result_set_ready()
+        rows = self.__fetch(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size: Union[int, None] = None):
+        """Return the next size rows from the result set."""
+        self._is_closed("cannot fetch multiple rows as the cursor is closed")
+        self._is_result_set_ready()
+        if not size:
+            size = self.arraysize
+        return self.__fetch(size)
+
+    def fetchall(self):
+        """Return all remaining rows from the result set."""
+        self._is_closed("cannot fetch all rows as the cursor is closed")
+        self._is_result_set_ready()
+        return self.__fetch(None)
+
+    def fetch_arrow_batches(self):
+        """Return the remaining rows as an iterator of pyarrow.RecordBatch.
+
+           The rows are not converted to tuples as required by PEP 249, so
+           this is preferable when the result set is processed in bulk.
+        """
+        self._is_closed("cannot fetch record batches as the cursor is closed")
+        self._is_result_set_ready()
+        batches = (chunk.data for chunk in self.__chunks)
+        if self.__offset < len(self.__rows):
+            remaining = self.__batch.slice(self.__offset)
+            self.__offset = len(self.__rows)
+            batches = itertools.chain([remaining], batches)
+        return batches
+
+    def fetch_arrow_table(self):
+        """Return the remaining rows as a pyarrow.Table.
+
+           The rows are not converted to tuples as required by PEP 249, so
+           this is preferable when the result set is processed in bulk.
+        """
+        self._is_closed("cannot fetch a table as the cursor is closed")
+        self._is_result_set_ready()
+        return pyarrow.Table.from_batches(
+            list(self.fetch_arrow_batches()), self.__schema)
+
+    def __fetch(self, size: Union[int, None]):
+        """Return the next size rows, or all rows if size is None."""
+        # Rows are sliced from the current chunk instead of one at a time
+        rows = []
+        while (size is None or len(rows) < size) and self.__buffer_rows():
+            if size is None:
+                rows.extend(self.__rows[self.__offset:])
+                self.__offset = len(self.__rows)
+            else:
+                end = self.__offset + size - len(rows)
+                rows.extend(self.__rows[self.__offset:end])
+                self.__offset = min(end, len(self.__rows))
+        return rows
+
+    def __buffer_rows(self):
+        """Buffer the next chunk's rows if all buffered rows have been read."""
+        while self.__offset == len(self.__rows):
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                return False
+
+            # Each column is converted at once so rows are created by zip()
+            self.__batch = chunk.data
+            columns = [column.to_pylist() for column in self.__batch.columns]
+            self.__rows = list(zip(*columns))
+            self.__offset = 0
+        return True
 
 
 class HTTPCursor(Cursor):
@@ -227,43 +377,89 @@ class HTTPCursor(Cursor):
         Cursor.__init__(self, connection)
         self.__uri = 'http://' + host + ':' + str(port)
 
-    def execute(self, operation: str, parameters: Any = None):
-        """Execute operation after adding the parameters."""
-        self._is_closed("cannot execute queries as the cursor is closed")
-        message = self._before_execute(operation.strip(), parameters)
+        # The connection is kept alive and reused for all of the queries
+        self.__http = HTTPConnection(host, port)
+
+    def close(self):
+        """Close the HTTP connection and mark the cursor as closed."""
+        self._is_closed("cannot close the cursor as it is already closed")
+        self.__http.close()
+        super().close()
+
+    def _execute_prepared(self, message: bytes):
+        """Execute message which already contains the parameters."""
         try:
-            response = request.urlopen(self.__uri, message)
-        except URLError:
-            message = "unable to connect to: " + self.__uri
+            try:
+                response = self.__post(message)
+            except (ConnectionError, HTTPException):
+                # The server may have closed the connection while it was idle
+                self.__http.close()
+                response = self.__post(message)
+        except (OSError, HTTPException):
             raise ProgrammingError("unable to connect to: " +
                                    self.__uri) from None
-        self._after_execute(response.read())
-        response.close()
+        self._after_execute(response)
+
+    def __post(self, message: bytes):
+        """Send message to ModelarDB and return the body of the response."""
+        self.__http.request('POST', '/', message, _HTTP_HEADERS)
+        response = self.__http.getresponse()
+        body = response.read()  # The body must be read to reuse the connection
+        if response.status != 200:
+            message = 'unable to execute query due to:\n' \
+                + str(response.status) + ' ' + response.reason
+            raise ProgrammingError(message)
+        return body
 
 
 class SocketCursor(Cursor):
     def __init__(self, connection: Connection, host: str, port: int):
         Cursor.__init__(self, connection)
+        self.__address = host + ':' + str(port)
         try:
-            self.__telnet = Telnet(host, port)
+            self.__socket = socket.create_connection((host, port))
         except ConnectionRefusedError:
-            message = "unable to connect to: " + host + ':' + str(port)
+            message = "unable to connect to: " + self.__address
             raise ProgrammingError(message) from None
 
+        # Queries are small so they should be sent without waiting for an ACK
+        self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
     def close(self):
         """Close the socket and mark the cursor as closed."""
         self._is_closed("cannot close the cursor as it is already closed")
-        self.__telnet.close()
+        self.__socket.close()
         super().close()
 
-    def execute(self, operation: str, parameters: Any = None):
-        """Execute operation after adding the parameters."""
-        self._is_closed("cannot execute queries as the cursor is closed")
-        message = self._before_execute(operation.strip() + '\n', parameters)
-        self.__telnet.write(message)
-        result = []
-        response = self.__telnet.read_some()
-        while response:
-            result.append(response)
-            response = self.__telnet.read_very_eager()
-        self._after_execute(b''.join(result))
+    def _execute_prepared(self, message: bytes):
+        """Execute message which already contains the parameters."""
+        self.__socket.settimeout(None)
+        self.__socket.sendall(message + b'\n')
+
+        # Blocks until the entire response is received or the socket is closed
+        response = bytearray()
+        try:
+            received = self.__socket.recv(_RECEIVE_BUFFER_SIZE)
+            while received:
+                response += received
+                start = max(len(response) - _END_OF_RESPONSE_MAX_LENGTH, 0)
+                if not _END_OF_RESPONSE_RE.search(response, start):
+                    self.__socket.settimeout(None)
+                elif self.__has_even_quotes(response):
+                    break
+                else:
+                    self.__socket.settimeout(_RECEIVE_TIMEOUT)
+                received = self.__socket.recv(_RECEIVE_BUFFER_SIZE)
+        except socket.timeout:
+            # The rest of the response would be read by the next query
+            if _ROWS_RE.search(response):
+                self.close()
+                raise ProgrammingError("incomplete response received from: "
+                                       + self.__address) from None
+        self._after_execute(response)
+
+    @staticmethod
+    def __has_even_quotes(response: bytearray):
+        """Check if response has an even number of unescaped quotes."""
+        unescaped = _ESCAPED_CHARACTER_RE.sub(b'', response)
+        return unescaped.count(b'"') % 2 == 0
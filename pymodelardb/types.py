@@ -17,6 +17,7 @@
 # limitations under the License.
 
 from enum import Enum
+from enum import unique
 
 DEFAULT_PORT_NUMBER = 9999
 
@@ -37,6 +38,7 @@ class NotSupportedError(DatabaseError):
     """Error to be raised if a feature required by PEP 249 is not supported."""
 
 
+@unique
 class Interface(Enum):
     """The interfaces supported by the current Rust-based version of ModelarDB
        (ARROW) and the legacy JVM-based version of ModelarDB (ARROW, SOCKET,
@@ -46,6 +48,7 @@ class Interface(Enum):
     HTTP = 3
 
 
+@unique
 class TypeOf(Enum):
     """The different types description.type_of must match."""
     STRING = 1
@@ -23,6 +23,7 @@ setup(
     author_email='devel@kejserjensen.dk',
     packages=find_packages(),
     install_requires=['pyarrow'],
+    extras_require={'orjson': ['orjson']},
     url='https://github.com/modelardata/pymodelardb',
     license='Apache License 2.0',
     description='Python PEP 249 Client for ModelarDB',
@@ -25,50 +25,44 @@ from pymodelardb.cursors import SocketCursor
 
 
 class ConnectionTest(unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        # Mocks the Apache Arrow Flight, HTTP, and socket interface
-        cls.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        cls.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        cls.socket.bind(("localhost", DEFAULT_PORT_NUMBER))
-        cls.socket.listen()
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.socket.close()
-
-    def test_construct_dsn_arrow_correct(self):
-        conn = Connection("arrow://localhost")
-        cursor = conn.cursor()
-        self.assertIsInstance(cursor, ArrowCursor)
-        cursor.close()
-
-    def test_construct_dsn_http_correct(self):
-        conn = Connection("http://localhost")
-        cursor = conn.cursor()
-        self.assertIsInstance(cursor, HTTPCursor)
-        cursor.close()
-
-    def test_construct_dsn_socket_correct(self):
-        conn = Connection("socket://localhost")
-        cursor = conn.cursor()
-        self.assertIsInstance(cursor, SocketCursor)
-        cursor.close()
+    def listen(self):
+        """Mock the socket interface on a port selected by the OS."""
+        # Only needed by tests creating a SocketCursor as it connects eagerly
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(("localhost", 0))
+        listener.listen()
+        return listener.getsockname()[1]
+
+    def test_construct_dsn_correct(self):
+        port = self.listen()
+        for dsn, cursor_class in [
+                ("arrow://localhost", ArrowCursor),
+                ("http://localhost", HTTPCursor),
+                ("socket://localhost:" + str(port), SocketCursor)]:
+            with self.subTest(dsn=dsn):
+                conn = Connection(dsn)
+                cursor = conn.cursor()
+                self.assertIsInstance(cursor, cursor_class)
+                cursor.close()
 
     def test_construct_dsn_with_port_correct(self):
         Connection("http://localhost:" + str(DEFAULT_PORT_NUMBER + 1))
 
-    def test_construct_dsn_arrow_wrong_separator(self):
+    def test_construct_dsn_with_wrong_port(self):
         with self.assertRaises(ProgrammingError):
-            Connection("arrow:/localhost")
+            Connection("http://localhost:port")
 
-    def test_construct_dsn_http_wrong_separator(self):
+    def test_construct_dsn_with_empty_port(self):
         with self.assertRaises(ProgrammingError):
-            Connection("http:/localhost")
+            Connection("http://localhost:")
 
-    def test_construct_dsn_socket_wrong_separator(self):
-        with self.assertRaises(ProgrammingError):
-            Connection("socket:/localhost")
+    def test_construct_dsn_wrong_separator(self):
+        for dsn in ["arrow:/localhost", "http:/localhost",
+                    "socket:/localhost"]:
+            with self.subTest(dsn=dsn):
+                with self.assertRaises(ProgrammingError):
+                    Connection(dsn)
 
     def test_construct_dsn_wrong_interface(self):
         with self.assertRaises(ProgrammingError):
@@ -86,23 +80,18 @@ class ConnectionTest(unittest.TestCase):
         with self.assertRaises(NotSupportedError):
             Connection(database="database")
 
-    def test_construct_host_interface_arrow_correct(self):
-        conn = Connection(host="localhost", interface="arrow")
-        cursor = conn.cursor()
-        self.assertIsInstance(cursor, ArrowCursor)
-        cursor.close()
-
-    def test_construct_host_interface_http_correct(self):
-        conn = Connection(host="localhost", interface="http")
-        cursor = conn.cursor()
-        self.assertIsInstance(cursor, HTTPCursor)
-        cursor.close()
-
-    def test_construct_host_interface_socket_correct(self):
-        conn = Connection(host="localhost", interface="socket")
-        cursor = conn.cursor()
-        self.assertIsInstance(cursor, SocketCursor)
-        cursor.close()
+    def test_construct_host_interface_correct(self):
+        socket_port = self.listen()
+        for interface, port, cursor_class in [
+                ("arrow", DEFAULT_PORT_NUMBER, ArrowCursor),
+                ("http", DEFAULT_PORT_NUMBER, HTTPCursor),
+                ("socket", socket_port, SocketCursor)]:
+            with self.subTest(interface=interface):
+                conn = Connection(host="localhost", interface=interface,
+                                  port=port)
+                cursor = conn.cursor()
+                self.assertIsInstance(cursor, cursor_class)
+                cursor.close()
 
     def test_construct_host_interface_with_port_correct(self):
         Connection(host="localhost", interface="http",
@@ -12,49 +12,196 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
 import json
-import locale
+import time
 import unittest
 import threading
 from datetime import datetime
+from typing import Union
 
 import pyarrow
 from pyarrow import flight
 
-import socket
+import socketserver
 
-from http.server import HTTPServer
+from http.server import ThreadingHTTPServer
 from http.server import BaseHTTPRequestHandler
 
 from pymodelardb.connection import Connection
 from pymodelardb.types import ProgrammingError
 from pymodelardb.types import TypeOf
-from pymodelardb.types import DEFAULT_PORT_NUMBER
+
+
+# The cursors encode queries and decode responses as UTF-8
+ENCODING = 'utf-8'
+
+# The responses are stored as bytes so they can be sent without encoding
+RESPONSE_ERROR = b"""
+{
+  "time": "PT0.3773S",
+  "query": "SELECT * FROM DataPoint",
+  "result":  [
+    Unknown Exception Occurred
+  ]
+}
+"""
+
+# The error message contains an odd number of quotes
+RESPONSE_ERROR_QUOTE = b"""
+{
+  "time": "PT0.3773S",
+  "query": "SELECT x FROM DataPoint",
+  "result":  [
+    Column "x" does not exist; did you mean "y
+  ]
+}
+"""
+
+RESPONSE_ROWS = b"""
+{
+  "time": "PT0.3773S",
+  "query": "SELECT * FROM DataPoint",
+  "result":  [
+    {"TID":1,"TIMESTAMP":"1990-05-01 12:00:00.0","VALUE":0.37},
+    {"TID":2,"TIMESTAMP":"1990-05-01 12:00:00.0","VALUE":0.55},
+    {"TID":3,"TIMESTAMP":"1990-05-01 12:00:00.0","VALUE":0.73}
+  ]
+}
+"""
+
+RESPONSE_NULL = b"""
+{
+  "time": "PT0.008S",
+  "query": "SELECT MIN(value) FROM DataPoint",
+  "result":  [
+    {"MIN(VALUE)":"NULL"}
+  ]
+}
+"""
+
+# The result set contains the end of a response in a string
+RESPONSE_BRACKETS = b"""
+{
+  "time": "PT0.3773S",
+  "query": "SELECT * FROM Brackets",
+  "result":  [
+    {"TID":1,"VALUE":"x]}"}
+  ]
+}
+"""
+
+RESPONSE_EMPTY = b"""
+{
+  "time": "PT7.996S",
+  "query": "SELECT MAX(value) FROM DataPoint",
+  "result":  [
+    {}
+  ]
+}
+"""
+
+# The mock servers are shared by all of the tests in the module and listen on
+# ports selected by the operating system so they never collide with others
+_ARROW_SERVER = None
+_HTTP_SERVER = None
+_SOCKET_SERVER = None
+_THREADS = []
+
+# serve_forever() only checks if shutdown() has been called this often
+POLL_INTERVAL = 0.05
+
+# Segments of a response are sent this long apart so they are received alone,
+# which is shorter than SocketCursor waits for a ]} to be continued but can be
+# increased to longer than it to test a server pausing in the middle of a query
+SEGMENT_DELAY = 0.05
+LONG_SEGMENT_DELAY = 0.25
+
+# A server that does not stop in time must not keep the tests from exiting
+JOIN_TIMEOUT = 2
 
 
 def parse_ts(timestamp: str):
     """Parse timestamps from str to datetime.datetime objects."""
-    return datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f')
+    # The format is fixed as YYYY-MM-DD HH:MM:SS.f so strptime() is not needed
+    return datetime(int(timestamp[0:4]), int(timestamp[5:7]),
+                    int(timestamp[8:10]), int(timestamp[11:13]),
+                    int(timestamp[14:16]), int(timestamp[17:19]),
+                    int(timestamp[20:26].ljust(6, '0')))
+
+
+def setUpModule():
+    global _ARROW_SERVER, _HTTP_SERVER, _SOCKET_SERVER
+    _ARROW_SERVER = start_arrow_server()
+    _HTTP_SERVER = start_http_server()
+    _SOCKET_SERVER = start_socket_server()
+
+
+def tearDownModule():
+    _ARROW_SERVER.shutdown()
+    _HTTP_SERVER.shutdown()
+    _HTTP_SERVER.server_close()
+    _SOCKET_SERVER.shutdown()
+    _SOCKET_SERVER.server_close()
+    for thread in _THREADS:
+        thread.join(timeout=JOIN_TIMEOUT)
+
+
+def start_arrow_server():
+    """Mock ModelarDB's Apache Arrow Flight interface."""
+    # The servers accept connections when created so no waiting is needed
+    location = "grpc://localhost:0"
+    server = ArrowFlightServer(location)
+    server.response = None
+    server.queries = []
+    start_thread(server.serve)
+    return server
+
+
+def start_http_server():
+    """Mock ModelarDB's HTTP interface."""
+    server = ThreadingHTTPServer(("localhost", 0), TestHTTPRequestHandler)
+    server.response = b""
+    server.queries = []
+    server.client_addresses = []
+    server.close_connection = False
+    start_thread(server.serve_forever, poll_interval=POLL_INTERVAL)
+    return server
+
+
+def start_socket_server():
+    """Mock ModelarDB's socket interface."""
+    server = TestSocketServer(("localhost", 0), TestSocketRequestHandler)
+    server.response = b""
+    server.segment_delay = SEGMENT_DELAY
+    server.queries = []
+    start_thread(server.serve_forever, poll_interval=POLL_INTERVAL)
+    return server
+
+
+def start_thread(target, **kwargs):
+    """Run target in a new daemon thread that is joined by tearDownModule()."""
+    thread = threading.Thread(target=target, kwargs=kwargs, daemon=True)
+    thread.start()
+    _THREADS.append(thread)
 
 
 class CursorTest(object):
+    EXPECTED_ROWS = [(1, '1990-05-01 12:00:00.0', 0.37),
+                     (2, '1990-05-01 12:00:00.0', 0.55),
+                     (3, '1990-05-01 12:00:00.0', 0.73)]
+
     @classmethod
     def setUpClass(cls):
-        cls.encoding = locale.getpreferredencoding()
-        cls.thread = threading.Thread(target=cls.start_server, args=())
-        cls.run_server = True
-        cls.thread.start()
-        # Ensure that the server runs without adding complexity to the tests
-        time.sleep(0.25)
+        # The connection is shared by the tests as only cursors connect
+        cls.connection = Connection(cls.dsn)
 
     @classmethod
     def tearDownClass(cls):
-        cls.run_server = False
-        cls.thread.join()
+        cls.connection.close()
 
     def setUp(self):
-        self.connection = Connection(self.dsn)
+        # The servers record the queries so the tests can check what is sent
+        self.server.queries.clear()
         self.cursor = self.connection.cursor()
 
     def tearDown(self):
@@ -63,36 +210,13 @@ class CursorTest(object):
         except ProgrammingError:
             pass
 
-        try:
-            self.connection.close()
-        except ProgrammingError:
-            pass
-
     def test_execute_select_error(self):
-        self.set_server_response("""
-        {
-          "time": "PT0.3773S",
-          "query": "SELECT * FROM DataPoint",
-          "result":  [
-            Unknown Exception Occurred
-          ]
-        }
-        """)
+        self.set_server_response(RESPONSE_ERROR)
         with self.assertRaises(ProgrammingError):
             self.cursor.execute("SELECT * FROM DataPoint")
 
     def test_execute_select_rows(self):
-        self.set_server_response("""
-        {
-          "time": "PT0.3773S",
-          "query": "SELECT * FROM DataPoint",
-          "result":  [
-            {"TID":1,"TIMESTAMP":"1990-05-01 12:00:00.0","VALUE":0.37},
-            {"TID":2,"TIMESTAMP":"1990-05-01 12:00:00.0","VALUE":0.55},
-            {"TID":3,"TIMESTAMP":"1990-05-01 12:00:00.0","VALUE":0.73}
-          ]
-        }
-        """)
+        self.set_server_response(RESPONSE_ROWS)
         self.cursor.execute("SELECT * FROM DataPoint")
 
     def test_execute_select_rows_metadata(self):
@@ -109,33 +233,50 @@ class CursorTest(object):
 
     def test_execute_select_rows_fetchone(self):
         self.test_execute_select_rows()
-        self.assertEqual(self.cursor.fetchone(),
-                         (1, '1990-05-01 12:00:00.0', 0.37))
+        self.assertEqual(self.cursor.fetchone(), self.EXPECTED_ROWS[0])
 
     def test_execute_select_rows_fetchmany(self):
         self.test_execute_select_rows()
-        self.assertEqual(self.cursor.fetchmany(37),
-                         [(1, '1990-05-01 12:00:00.0', 0.37),
-                          (2, '1990-05-01 12:00:00.0', 0.55),
-                          (3, '1990-05-01 12:00:00.0', 0.73)])
+        self.assertEqual(self.cursor.fetchmany(37), self.EXPECTED_ROWS)
 
     def test_execute_select_rows_fetchall(self):
         self.test_execute_select_rows()
-        self.assertEqual(self.cursor.fetchall(),
-                         [(1, '1990-05-01 12:00:00.0', 0.37),
-                          (2, '1990-05-01 12:00:00.0', 0.55),
-                          (3, '1990-05-01 12:00:00.0', 0.73)])
+        self.assertEqual(self.cursor.fetchall(), self.EXPECTED_ROWS)
+
+    def test_execute_select_rows_fetchmany_fetchall(self):
+        self.test_execute_select_rows()
+        self.assertEqual(self.cursor.fetchmany(2), self.EXPECTED_ROWS[:2])
+        self.assertEqual(self.cursor.fetchall(), self.EXPECTED_ROWS[2:])
+
+    def test_execute_select_rows_while_other_cursor_is_open(self):
+        other_cursor = self.cursor
+        self.cursor = self.connection.cursor()
+        self.test_execute_select_rows()
+        other_cursor.close()
+
+    def test_execute_bytes_select_rows(self):
+        self.set_server_response(RESPONSE_ROWS)
+        self.cursor.execute(b"SELECT * FROM DataPoint")
+        self.assertEqual(self.server.queries, [b"SELECT * FROM DataPoint"])
+        self.assertEqual(self.cursor.fetchall(), self.EXPECTED_ROWS)
+
+    def test_execute_bytearray_select_rows(self):
+        self.set_server_response(RESPONSE_ROWS)
+        self.cursor.execute(bytearray(b"SELECT * FROM DataPoint"))
+        self.assertEqual(self.server.queries, [b"SELECT * FROM DataPoint"])
+        self.assertEqual(self.cursor.fetchall(), self.EXPECTED_ROWS)
+
+    def test_executemany_select_rows(self):
+        self.set_server_response(RESPONSE_ROWS)
+        self.cursor.executemany(
+            "SELECT * FROM DataPoint WHERE TID = %(tid)s", [(1,), (2,)])
+        self.assertEqual(self.server.queries,
+                         [b"SELECT * FROM DataPoint WHERE TID = 1",
+                          b"SELECT * FROM DataPoint WHERE TID = 2"])
+        self.assertEqual(self.cursor.fetchall(), self.EXPECTED_ROWS)
 
     def test_execute_select_null(self):
-        self.set_server_response("""
-        {
-          "time": "PT0.008S",
-          "query": "SELECT MIN(value) FROM DataPoint",
-          "result":  [
-            {"MIN(VALUE)":"NULL"}
-          ]
-        }
-        """)
+        self.set_server_response(RESPONSE_NULL)
         self.cursor.execute("SELECT MIN(value) FROM DataPoint")
 
     def test_execute_select_null_metadata(self):
@@ -146,16 +287,12 @@ class CursorTest(object):
                          TypeOf.STRING, None, None, None, None, False))
         self.assertEqual(self.cursor.rowcount, 1)
 
+    def test_execute_select_null_fetchall(self):
+        self.test_execute_select_null()
+        self.assertEqual(self.cursor.fetchall(), [('NULL',)])
+
     def test_execute_select_empty(self):
-        self.set_server_response("""
-        {
-          "time": "PT7.996S",
-          "query": "SELECT MAX(value) FROM DataPoint",
-          "result":  [
-            {}
-          ]
-        }
-        """)
+        self.set_server_response(RESPONSE_EMPTY)
         self.cursor.execute("SELECT MAX(value) FROM DataPoint")
 
     def test_execute_select_empty_metadata(self):
@@ -175,6 +312,35 @@ class CursorTest(object):
         self.test_execute_select_empty()
         self.assertEqual(self.cursor.fetchall(), [])
 
+    def test_before_execute_dict(self):
+        operation = "SELECT * FROM DataPoint WHERE TID = %(tid)s"
+        self.assertEqual(self.cursor._before_execute(operation, {'tid': 1}),
+                         b"SELECT * FROM DataPoint WHERE TID = 1")
+
+    def test_before_execute_list(self):
+        operation = "SELECT * FROM DataPoint WHERE TID = %(tid)s"
+        self.assertEqual(self.cursor._before_execute(operation, [1]),
+                         b"SELECT * FROM DataPoint WHERE TID = 1")
+
+    def test_before_execute_tuple(self):
+        operation = "SELECT * FROM DataPoint WHERE TID = %(tid)s"
+        self.assertEqual(self.cursor._before_execute(operation, (1,)),
+                         b"SELECT * FROM DataPoint WHERE TID = 1")
+
+    def test_before_execute_bytes(self):
+        operation = b"SELECT * FROM DataPoint"
+        self.assertIs(self.cursor._before_execute(operation), operation)
+
+    def test_before_execute_bytearray(self):
+        operation = bytearray(b"SELECT * FROM DataPoint")
+        self.assertEqual(self.cursor._before_execute(operation),
+                         b"SELECT * FROM DataPoint")
+
+    def test_before_execute_bytes_parameters(self):
+        operation = b"SELECT * FROM DataPoint WHERE TID = %(tid)s"
+        with self.assertRaises(ProgrammingError):
+            self.cursor._before_execute(operation, {'tid': 1})
+
     def test_close(self):
         self.cursor.close()
 
@@ -198,30 +364,38 @@ class ArrowFlightServer(flight.FlightServerBase):
         super(ArrowFlightServer, self).__init__(location=location)
 
     def do_get(self, _, ticket):
+        self.queries.append(ticket.ticket)
         if ticket == flight.Ticket('ERROR'):
             raise pyarrow.ArrowInvalid('an error has occurred')
-        return flight.RecordBatchStream(self.response)
+        # Rows are sent in batches of two so the cursor must both slice the
+        # rows in a batch and continue reading rows from the next batch
+        batches = self.response.to_batches(max_chunksize=2)
+        return flight.GeneratorStream(self.response.schema, iter(batches))
 
 
 class ArrowCursorTest(CursorTest, unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        cls.thread = threading.Thread(target=cls.start_server, args=())
-        cls.thread.start()
-        # Ensure that the server runs without adding complexity to the tests
-        time.sleep(0.25)
+    EXPECTED_ROWS = [(1, parse_ts('1990-05-01 12:00:00.0'), 0.37),
+                     (2, parse_ts('1990-05-01 12:00:00.0'), 0.55),
+                     (3, parse_ts('1990-05-01 12:00:00.0'), 0.73)]
+
+    # Tables are immutable so they are shared by tests with the same response
+    tables = {}
 
     @classmethod
-    def start_server(cls):
-        # Mock ModelarDB's Apache Arrow Flight interface
-        cls.dsn = "arrow://localhost"
-        location = "grpc://localhost:" + str(DEFAULT_PORT_NUMBER)
-        cls.server = ArrowFlightServer(location)
-        cls.server.response = None
-        cls.server.serve()
+    def setUpClass(cls):
+        cls.dsn = "arrow://localhost:" + str(_ARROW_SERVER.port)
+        cls.server = _ARROW_SERVER
+        super().setUpClass()
 
     @classmethod
-    def set_server_response(cls, response: str):
+    def set_server_response(cls, response: Union[str, bytes]):
+        table = cls.tables.get(response)
+        if table is None:
+            table = cls.tables[response] = cls.create_table(response)
+        cls.server.response = table
+
+    @staticmethod
+    def create_table(response: Union[str, bytes]):
         rows = json.loads(response)['result']
 
         # Values are float64 instead of float32 so assertEqual can be used
@@ -236,26 +410,15 @@ class ArrowCursorTest(CursorTest, unittest.TestCase):
             raise ValueError("unknown schema")
         schema = pyarrow.schema(columns)
 
+        # The columns are added in the schema's order and typed by the schema
         columns = {}
-        for row in rows:
-            for name, value in row.items():
-                column = columns.get(name, [])
-
-                if name == 'TIMESTAMP':
-                    column.append(parse_ts(value))
-                elif value == 'NULL':
-                    column.append(None)
-                else:
-                    column.append(value)
-                columns[name] = column
-
-        columns = list(map(lambda name: columns[name], schema.names))
-        cls.server.response = pyarrow.table(columns, schema)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.server.shutdown()
-        cls.thread.join()
+        for name in schema.names:
+            if name == 'TIMESTAMP':
+                columns[name] = [parse_ts(row[name]) for row in rows]
+            else:
+                columns[name] = [None if row[name] == 'NULL'
+                                 else row[name] for row in rows]
+        return pyarrow.Table.from_pydict(columns, schema=schema)
 
     def test_execute_select_error(self):
         with self.assertRaises(ProgrammingError):
@@ -273,24 +436,26 @@ class ArrowCursorTest(CursorTest, unittest.TestCase):
                          TypeOf.NUMBER, None, None, None, None, False))
         self.assertEqual(self.cursor.rowcount, -1)
 
-    def test_execute_select_rows_fetchone(self):
+    def test_execute_select_rows_fetch_arrow_batches(self):
         self.test_execute_select_rows()
-        self.assertEqual(self.cursor.fetchone(),
-                         (1, parse_ts('1990-05-01 12:00:00.0'), 0.37))
+        batches = list(self.cursor.fetch_arrow_batches())
+        self.assertEqual(pyarrow.Table.from_batches(batches),
+                         self.server.response)
 
-    def test_execute_select_rows_fetchmany(self):
+    def test_execute_select_rows_fetch_arrow_table(self):
         self.test_execute_select_rows()
-        self.assertEqual(self.cursor.fetchmany(37),
-                         [(1, parse_ts('1990-05-01 12:00:00.0'), 0.37),
-                          (2, parse_ts('1990-05-01 12:00:00.0'), 0.55),
-                          (3, parse_ts('1990-05-01 12:00:00.0'), 0.73)])
+        self.assertEqual(self.cursor.fetch_arrow_table(),
+                         self.server.response)
 
-    def test_execute_select_rows_fetchall(self):
+    def test_execute_select_rows_fetchone_fetch_arrow_table(self):
         self.test_execute_select_rows()
-        self.assertEqual(self.cursor.fetchall(),
-                         [(1, parse_ts('1990-05-01 12:00:00.0'), 0.37),
-                          (2, parse_ts('1990-05-01 12:00:00.0'), 0.55),
-                          (3, parse_ts('1990-05-01 12:00:00.0'), 0.73)])
+        self.cursor.fetchone()
+        self.assertEqual(self.cursor.fetch_arrow_table(),
+                         self.server.response.slice(1))
+
+    def test_execute_select_empty_fetch_arrow_table(self):
+        self.test_execute_select_empty()
+        self.assertEqual(self.cursor.fetch_arrow_table().num_rows, 0)
 
     def test_execute_select_null_metadata(self):
         self.test_execute_select_null()
@@ -300,6 +465,10 @@ class ArrowCursorTest(CursorTest, unittest.TestCase):
                          TypeOf.NUMBER, None, None, None, None, False))
         self.assertEqual(self.cursor.rowcount, -1)
 
+    def test_execute_select_null_fetchall(self):
+        self.test_execute_select_null()
+        self.assertEqual(self.cursor.fetchall(), [(None,)])
+
     def test_execute_select_empty_metadata(self):
         self.test_execute_select_empty()
         self.assertEqual(len(self.cursor.description), 0)
@@ -307,13 +476,27 @@ class ArrowCursorTest(CursorTest, unittest.TestCase):
 
 
 class TestHTTPRequestHandler(BaseHTTPRequestHandler):
+    # The headers and the body are written separately so Nagle's algorithm
+    # could otherwise delay the body until the headers are acknowledged
+    disable_nagle_algorithm = True
+
+    # The connection is kept alive between requests like HTTPCursor expects
+    protocol_version = 'HTTP/1.1'
+
     def do_POST(self):
+        # The query is read so it is recorded and the connection is not reset
+        query = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.queries.append(query)
+        self.server.client_addresses.append(self.client_address)
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(self.server.response)))
         self.end_headers()
-        self.wfile.write(self.response)
-        # Ensure the response is read without adding complexity to the test
-        time.sleep(0.25)
+        self.wfile.write(self.server.response)
+
+        # The connection is closed without telling the client, like when
+        # a server closes idle connections, if the test requests it
+        self.close_connection = self.server.close_connection
 
     def log_message(self, format, *args):
         pass  # Stop messages being written to stdout
@@ -321,44 +504,118 @@ class TestHTTPRequestHandler(BaseHTTPRequestHandler):
 
 class HTTPCursorTest(CursorTest, unittest.TestCase):
     @classmethod
-    def start_server(cls):
-        # Mock ModelarDB's HTTP interface
-        cls.dsn = "http://localhost"
-        HTTPServer.allow_reuse_address = True
-        cls.handler = TestHTTPRequestHandler
-        cls.server = HTTPServer(
-            ("localhost", DEFAULT_PORT_NUMBER), cls.handler)
-        cls.server.timeout = 0.20
-        cls.response = b""
-
-        while cls.run_server:
-            cls.server.handle_request()
-        cls.server.server_close()
+    def setUpClass(cls):
+        cls.dsn = "http://localhost:" + str(_HTTP_SERVER.server_address[1])
+        cls.server = _HTTP_SERVER
+        super().setUpClass()
+
+    def setUp(self):
+        self.server.client_addresses.clear()
+        self.server.close_connection = False
+        super().setUp()
 
     @classmethod
-    def set_server_response(cls, response: str):
-        cls.handler.response = response.encode(cls.encoding)
+    def set_server_response(cls, response: Union[str, bytes]):
+        cls.server.response = response if isinstance(response, bytes) \
+            else response.encode(ENCODING)
+
+    def test_execute_select_rows_twice(self):
+        self.test_execute_select_rows()
+        self.test_execute_select_rows()
+        self.assertEqual(len(self.cursor.fetchall()), 3)
+
+        # Both queries are sent using the same connection
+        self.assertEqual(len(self.server.client_addresses), 2)
+        self.assertEqual(len(set(self.server.client_addresses)), 1)
+
+    def test_execute_select_rows_twice_connection_closed(self):
+        self.server.close_connection = True
+        self.test_execute_select_rows()
+        self.test_execute_select_rows()
+        self.assertEqual(len(self.cursor.fetchall()), 3)
+
+        # The second query is sent again using a new connection
+        self.assertEqual(len(self.server.client_addresses), 2)
+        self.assertEqual(len(set(self.server.client_addresses)), 2)
+
+
+class TestSocketServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+
+class TestSocketRequestHandler(socketserver.StreamRequestHandler):
+    # The response is sent immediately like SocketCursor sends the query
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        # Like the legacy JVM-based version of ModelarDB the connection is
+        # kept open and each query is answered until the cursor closes it
+        try:
+            for query in self.rfile:
+                self.server.queries.append(query.rstrip(b'\n'))
+                response = self.server.response
+                if isinstance(response, bytes):
+                    self.wfile.write(response)
+                else:
+                    for segment in response:
+                        self.wfile.write(segment)
+                        time.sleep(self.server.segment_delay)
+        except ConnectionError:
+            pass  # The cursor closed the connection before the response ended
 
 
 class SocketCursorTest(CursorTest, unittest.TestCase):
     @classmethod
-    def start_server(cls):
-        # Mock ModelarDB's Socket interface
-        cls.dsn = "socket://localhost"
-        cls.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        cls.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        cls.socket.bind(("localhost", DEFAULT_PORT_NUMBER))
-        cls.socket.listen()
-        cls.response = b""
-
-        while cls.run_server:
-            conn, _ = cls.socket.accept()
-            conn.sendall(cls.response)
-            # Ensure the response is read without adding complexity to the test
-            time.sleep(0.25)
-            conn.close()
-        cls.socket.close()
+    def setUpClass(cls):
+        cls.dsn = "socket://localhost:" + str(_SOCKET_SERVER.server_address[1])
+        cls.server = _SOCKET_SERVER
+        super().setUpClass()
+
+    def setUp(self):
+        self.server.segment_delay = SEGMENT_DELAY
+        super().setUp()
 
     @classmethod
-    def set_server_response(cls, response: str):
-        cls.response = response.encode(cls.encoding)
+    def set_server_response(cls, response: Union[str, bytes]):
+        cls.server.response = response if isinstance(response, bytes) \
+            else response.encode(ENCODING)
+
+    def test_execute_select_end_of_response_in_string(self):
+        # The first segment ends with the ]} in the string
+        end_of_first_segment = RESPONSE_BRACKETS.index(b']}') + 2
+        self.server.response = [RESPONSE_BRACKETS[:end_of_first_segment],
+                                RESPONSE_BRACKETS[end_of_first_segment:]]
+        for _ in range(2):
+            self.cursor.execute("SELECT * FROM Brackets")
+            self.assertEqual(self.cursor.fetchall(), [(1, 'x]}')])
+
+    def test_execute_select_end_of_response_in_string_delayed(self):
+        # The rest of the string is not received before the timeout
+        self.server.segment_delay = LONG_SEGMENT_DELAY
+        end_of_first_segment = RESPONSE_BRACKETS.index(b']}') + 2
+        self.server.response = [RESPONSE_BRACKETS[:end_of_first_segment],
+                                RESPONSE_BRACKETS[end_of_first_segment:]]
+        with self.assertRaises(ProgrammingError):
+            self.cursor.execute("SELECT * FROM Brackets")
+
+        # The cursor is closed as the stream is no longer synchronized
+        with self.assertRaises(ProgrammingError):
+            self.cursor.execute("SELECT * FROM Brackets")
+
+    def test_execute_select_rows_delayed(self):
+        # The server pauses for longer than the timeout in the result set
+        self.server.segment_delay = LONG_SEGMENT_DELAY
+        end_of_first_segment = RESPONSE_ROWS.index(b'{"TID":2')
+        self.server.response = [RESPONSE_ROWS[:end_of_first_segment],
+                                RESPONSE_ROWS[end_of_first_segment:]]
+        for _ in range(2):
+            self.cursor.execute("SELECT * FROM DataPoint")
+            self.assertEqual(self.cursor.fetchall(), self.EXPECTED_ROWS)
+
+    def test_execute_select_error_with_quote(self):
+        self.set_server_response(RESPONSE_ERROR_QUOTE)
+        with self.assertRaisesRegex(ProgrammingError, 'did you mean "y'):
+            self.cursor.execute("SELECT x FROM DataPoint")
+
+        # The whole error was read so the next query can be executed
+        self.test_execute_select_rows_fetchall()